@@ -2,14 +2,23 @@
 Frontend streamlit app - Retro Light/Office Theme
 """
 
+import html
+import math
+import re
+import time
+
+import connectorx as cx
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 from plotly.subplots import make_subplots
 from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine, make_url
 
 # Internal imports
-from database import get_db
+from config import settings
+from database import engine
 
 # -----------------------------------------------------------------------------
 # Configuration & Setup
@@ -18,13 +27,24 @@ st.set_page_config(
     page_title="Sentiment-Price Tracker", layout="wide", initial_sidebar_state="expanded"
 )
 
+# connectorx expects a plain postgresql:// URL without the SQLAlchemy driver suffix
+_db_url = make_url(settings.DB_URL)
+CX_DB_URL = _db_url.set(drivername=_db_url.get_backend_name()).render_as_string(hide_password=False)
+
+# Tickers are interpolated into connectorx queries, so only allow this whitelist
+TICKER_PATTERN = re.compile(r"[A-Z0-9.]+")
+
+# Dashboard data is refreshed from the DB at most this often
+DATA_TTL_SECONDS = 300
+
+# Headlines shown per News Archive page
+NEWS_PAGE_SIZE = 50
+
 
 # -----------------------------------------------------------------------------
 # Retro Light Theme CSS
 # -----------------------------------------------------------------------------
-def inject_custom_css():
-    st.markdown(
-        """
+CUSTOM_CSS = """
         <style>
             /* Import a clean monospaced font */
             @import url('https://fonts.googleapis.com/css2?family=Courier+Prime:wght@400;700&display=swap');
@@ -127,9 +147,16 @@ def inject_custom_css():
                 color: #000000;
             }
         </style>
-    """,
-        unsafe_allow_html=True,
-    )
+    """
+
+
+@st.cache_resource
+def _css_blob() -> str:
+    return CUSTOM_CSS
+
+
+def inject_custom_css():
+    st.markdown(_css_blob(), unsafe_allow_html=True)
 
 
 # -----------------------------------------------------------------------------
@@ -137,77 +164,164 @@ def inject_custom_css():
 # -----------------------------------------------------------------------------
 
 
+class LazyConnection:
+    """
+    Checks out one pooled connection on first execute and shares it for the rest of the rerun
+
+    Reruns served entirely from st.cache_data never touch the pool (or its pre-ping)
+    """
+
+    def __init__(self, engine: Engine):
+        self._engine = engine
+        self._conn: Connection | None = None
+
+    def execute(self, *args, **kwargs):
+        if self._conn is None:
+            self._conn = self._engine.connect()
+        return self._conn.execute(*args, **kwargs)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
 @st.cache_data(ttl=300)
-def get_ticker_options():
-    db = next(get_db())
+def get_ticker_options(_conn: LazyConnection):
+    # Leading underscore keeps the connection out of the cache key
     try:
         query = text(
             "SELECT DISTINCT ticker, alias FROM sentiment WHERE alias IS NOT NULL ORDER BY alias ASC"
         )
-        result = db.execute(query).fetchall()
+        result = _conn.execute(query).fetchall()
         mapping = {row.alias: row.ticker for row in result}
         return mapping
     except Exception as e:
         st.error(f"Error fetching ticker list: {e}")
         return {}
-    finally:
-        db.close()
 
 
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
 def get_data_from_db(ticker: str, days: int = 30):
-    db = next(get_db())
-    try:
-        # 1. Fetch Price Data
-        price_query = text("""
-            SELECT timestamp, close_price, volume
-            FROM price
-            WHERE ticker = :ticker
-            AND timestamp >= NOW() - INTERVAL ':days days'
-            ORDER BY timestamp ASC
-        """)
-        df_price = pd.read_sql(
-            price_query,
-            db.bind,
-            params={"ticker": ticker, "days": days},
-            parse_dates=["timestamp"],
-        )
+    # Errors propagate so st.cache_data never stores a failed fetch, the caller reports them
+    if not TICKER_PATTERN.fullmatch(ticker):
+        raise ValueError(f"invalid ticker {ticker!r}")
+    days = int(days)
+
+    # 1. Fetch Price Data
+    price_query = f"""
+        SELECT timestamp, close_price, volume
+        FROM price
+        WHERE ticker = '{ticker}'
+        AND timestamp >= NOW() - make_interval(days => {days})
+        ORDER BY timestamp ASC
+    """
+    df_price = cx.read_sql(CX_DB_URL, price_query, return_type="pandas")
+
+    # 2. Fetch Sentiment Data
+    sentiment_query = f"""
+        SELECT published_at, headline, sentiment_score, sentiment_label, link
+        FROM sentiment
+        WHERE ticker = '{ticker}'
+        AND published_at >= NOW() - make_interval(days => {days})
+        ORDER BY published_at ASC
+    """
+    df_sentiment = cx.read_sql(CX_DB_URL, sentiment_query, return_type="pandas")
 
-        # 2. Fetch Sentiment Data
-        sentiment_query = text("""
-            SELECT published_at, headline, sentiment_score, sentiment_label, link
+    # Downcast to halve the bytes carried through aggregation and chart serialization
+    df_price = df_price.astype({"close_price": "float32", "volume": "int64"})
+    df_sentiment["sentiment_score"] = df_sentiment["sentiment_score"].astype("float32")
+    return df_price, df_sentiment
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_24h_sentiment(_conn: LazyConnection, ticker: str) -> tuple[float, int]:
+    """Average sentiment score and headline count over the last 24 hours, aggregated in SQL"""
+    try:
+        query = text("""
+            SELECT AVG(sentiment_score) AS avg_score, COUNT(*) AS headline_count
             FROM sentiment
             WHERE ticker = :ticker
-            AND published_at >= NOW() - INTERVAL ':days days'
-            ORDER BY published_at ASC
+            AND published_at > NOW() - INTERVAL '24 hours'
         """)
-        df_sentiment = pd.read_sql(
-            sentiment_query,
-            db.bind,
-            params={"ticker": ticker, "days": days},
-            parse_dates=["published_at"],
-        )
-        return df_price, df_sentiment
+        row = _conn.execute(query, {"ticker": ticker}).one()
+        return float(row.avg_score or 0.0), row.headline_count
     except Exception as e:
-        st.error(f"Error fetching data: {e}")
-        return pd.DataFrame(), pd.DataFrame()
-    finally:
-        db.close()
+        st.error(f"Error fetching 24h sentiment: {e}")
+        return 0.0, 0
+
+
+def _hour_bins(timestamps: pd.Series) -> np.ndarray:
+    """Integer hour bucket (hours since epoch) for each timestamp"""
+    return timestamps.values.astype("datetime64[h]").view("i8")
+
+
+def _hourly_mean(bins: np.ndarray, values: np.ndarray, n_bins: int) -> np.ndarray:
+    """
+    Mean of values per hour bucket, NaN for empty buckets
+
+    Equivalent to resample("1h").mean() without building a resampler.
+    float32 input stays float32, integers become float64.
+    """
+    valid = ~np.isnan(values)
+    sums = np.bincount(bins[valid], weights=values[valid], minlength=n_bins)
+    counts = np.bincount(bins[valid], minlength=n_bins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return means.astype(np.result_type(values.dtype, np.float32))
 
 
+@st.cache_data(ttl=300, show_spinner=False)
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean over the last `window` points, skipping NaN
+
+    Equivalent to rolling(window, min_periods=1).mean() using prefix sums.
+    """
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(0, end - window)
+    window_counts = counts[end] - counts[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, (sums[end] - sums[start]) / window_counts, np.nan)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
 def process_aggregated_view(df_price: pd.DataFrame, df_sentiment: pd.DataFrame):
     if df_price.empty:
         return pd.DataFrame()
 
-    df_p = df_price.set_index("timestamp").sort_index()
-    df_p_agg = df_p.resample("1h").mean()
-
+    price_bins = _hour_bins(df_price["timestamp"])
     if not df_sentiment.empty:
-        df_s = df_sentiment.set_index("published_at").sort_index()
-        df_s_agg = df_s[["sentiment_score"]].resample("1h").mean()
+        sentiment_bins = _hour_bins(df_sentiment["published_at"])
+        all_bins = np.concatenate([price_bins, sentiment_bins])
     else:
-        df_s_agg = pd.DataFrame(index=df_p_agg.index, columns=["sentiment_score"])
+        sentiment_bins = None
+        all_bins = price_bins
+
+    # Shared hourly range covering both price and sentiment
+    min_bin = all_bins.min()
+    n_bins = int(all_bins.max() - min_bin) + 1
+    index = pd.date_range(np.datetime64(int(min_bin), "h"), periods=n_bins, freq="1h")
+    if df_price["timestamp"].dt.tz is not None:
+        index = index.tz_localize("UTC").tz_convert(df_price["timestamp"].dt.tz)
+
+    combined_df = pd.DataFrame(index=index)
+    for col in ["close_price", "volume"]:
+        combined_df[col] = _hourly_mean(price_bins - min_bin, df_price[col].to_numpy(), n_bins)
+
+    if sentiment_bins is not None:
+        combined_df["sentiment_score"] = _hourly_mean(
+            sentiment_bins - min_bin,
+            df_sentiment["sentiment_score"].to_numpy(),
+            n_bins,
+        )
+    else:
+        combined_df["sentiment_score"] = np.float32(np.nan)
 
-    combined_df = df_p_agg.join(df_s_agg, how="outer")
     return combined_df
 
 
@@ -223,7 +337,7 @@ def plot_dual_axis_chart(df: pd.DataFrame, ticker: str, alias: str, ma_window: i
 
     # Trace 1: Stock Price (Solid Navy Blue)
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             x=df.index,
             y=df["close_price"],
             name="Stock Price",
@@ -235,7 +349,7 @@ def plot_dual_axis_chart(df: pd.DataFrame, ticker: str, alias: str, ma_window: i
 
     # Trace 2: Sentiment Score (Burnt Orange/Red)
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             x=df.index,
             y=df["sentiment_score"],
             name="Sentiment Index",
@@ -250,11 +364,10 @@ def plot_dual_axis_chart(df: pd.DataFrame, ticker: str, alias: str, ma_window: i
     # --- NEW: Trace 3: Moving Average (Black Dotted Trend) ---
     if ma_window > 0:
         ma_window = ma_window * 24
-        # Calculate Moving Average on the fly
-        df["sent_ma"] = df["sentiment_score"].rolling(window=ma_window, min_periods=1).mean()
+        df["sent_ma"] = rolling_mean(df["sentiment_score"].to_numpy(dtype="float64"), ma_window)
 
         fig.add_trace(
-            go.Scatter(
+            go.Scattergl(
                 x=df.index,
                 y=df["sent_ma"],
                 name=f"Sentiment Trend ({ma_window}h MA)",
@@ -326,18 +439,57 @@ def plot_dual_axis_chart(df: pd.DataFrame, ticker: str, alias: str, ma_window: i
     st.plotly_chart(fig, width="stretch")
 
 
+# Clean styling for sentiment
+SENTIMENT_STYLES = {
+    "positive": "color: #006600; font-weight: bold;",  # Dark Green
+    "negative": "color: #cc0000; font-weight: bold;",  # Dark Red
+}
+NEUTRAL_STYLE = "color: #666666;"
+
+
+def render_news_table(df_news: pd.DataFrame) -> str:
+    """
+    Builds the News Archive table HTML directly instead of going through pandas Styler
+    """
+    rows = "".join(
+        f"<tr><td>{published_at}</td><td>{html.escape(headline)}</td>"
+        f"<td style='{SENTIMENT_STYLES.get(label, NEUTRAL_STYLE)}'>{label}</td>"
+        f"<td>{score:.2f}</td></tr>"
+        for published_at, headline, label, score in zip(
+            df_news["published_at"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            df_news["headline"],
+            df_news["sentiment_label"],
+            df_news["sentiment_score"],
+        )
+    )
+    header = "".join(
+        f"<th>{col}</th>"
+        for col in ["published_at", "headline", "sentiment_label", "sentiment_score"]
+    )
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>"
+
+
 # -----------------------------------------------------------------------------
 # Main Application Logic
 # -----------------------------------------------------------------------------
 def main():
     inject_custom_css()
 
+    # One pooled connection serves every SQLAlchemy query in this rerun, taken on a cache miss
+    conn = LazyConnection(engine)
+    try:
+        render_dashboard(conn)
+    finally:
+        conn.close()
+
+
+def render_dashboard(conn: LazyConnection):
     # Sidebar
     st.sidebar.title("Parameters")
     st.sidebar.markdown("---")
 
     # 1. Ticker Selection
-    ticker_map = get_ticker_options()
+    ticker_map = get_ticker_options(conn)
 
     if not ticker_map:
         st.sidebar.warning("System Alert: No tickers found in database.")
@@ -372,8 +524,22 @@ def main():
     if selected_alias:
         st.markdown(f"Retrieving data for **{selected_alias}** [{selected_ticker}]...")
 
-        with st.spinner(f"Querying database..."):
-            df_price_raw, df_news_raw = get_data_from_db(selected_ticker, days=time_range)
+        # Reuse the previous rerun's frames when only unrelated widgets changed,
+        # the TTL bucket makes sure they still refresh like the cache does
+        data_key = (selected_ticker, time_range, int(time.time() // DATA_TTL_SECONDS))
+        if st.session_state.get("_data_key") == data_key:
+            df_price_raw, df_news_raw = st.session_state["_data"]
+        else:
+            with st.spinner("Querying database..."):
+                try:
+                    df_price_raw, df_news_raw = get_data_from_db(selected_ticker, days=time_range)
+                except Exception as e:
+                    # Not kept in session_state, the next rerun queries again
+                    st.error(f"Error fetching data: {e}")
+                    df_price_raw, df_news_raw = pd.DataFrame(), pd.DataFrame()
+                else:
+                    st.session_state["_data"] = (df_price_raw, df_news_raw)
+                    st.session_state["_data_key"] = data_key
 
         if df_price_raw.empty:
             st.warning(f"Notice: No price records found for {selected_ticker}.")
@@ -381,19 +547,16 @@ def main():
             # 2. Key Metrics
             latest_price = df_price_raw.iloc[-1]["close_price"]
 
-            if not df_news_raw.empty:
-                last_24h = df_news_raw[
-                    df_news_raw["published_at"]
-                    > (df_news_raw["published_at"].max() - pd.Timedelta(hours=24))
-                ]
-                avg_sent_24h = last_24h["sentiment_score"].mean() if not last_24h.empty else 0.0
-            else:
-                avg_sent_24h = 0.0
+            avg_sent_24h, count_24h = get_24h_sentiment(conn, selected_ticker)
 
             # Metrics
             col1, col2, col3 = st.columns(3)
             col1.metric("Latest Price", f"{latest_price:.2f}")
-            col2.metric("24h Sentiment Score", f"{avg_sent_24h:.2f}")
+            col2.metric(
+                "24h Sentiment Score",
+                f"{avg_sent_24h:.2f}",
+                help=f"Average of {count_24h} headlines from the last 24 hours",
+            )
             col3.metric("Total Headlines", len(df_news_raw))
 
             st.markdown("---")
@@ -403,33 +566,22 @@ def main():
             plot_dual_axis_chart(agg_df, selected_ticker, selected_alias, ma_window)
 
             # 4. Detailed News View
-            st.subheader("News Archive")
-
-            if not df_news_raw.empty:
-                display_news = df_news_raw.copy()
-                display_news = display_news.sort_values(by="published_at", ascending=False)
-
-                # Simple text arrow for link
-                display_news["headline"] = display_news["headline"]
-
-                # Clean styling for sentiment
-                def color_sentiment(val):
-                    if val == "positive":
-                        return "color: #006600; font-weight: bold;"  # Dark Green
-                    elif val == "negative":
-                        return "color: #cc0000; font-weight: bold;"  # Dark Red
-                    return "color: #666666;"
-
-                st.markdown(
-                    display_news[["published_at", "headline", "sentiment_label", "sentiment_score"]]
-                    .style.format({"sentiment_score": "{:.2f}"})
-                    .map(color_sentiment, subset=["sentiment_label"])
-                    .hide()
-                    .to_html(escape=False),
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.info("No relevant news items found for the selected period.")
+            with st.expander("News Archive", expanded=False):
+                if not df_news_raw.empty:
+                    display_news = df_news_raw.sort_values(by="published_at", ascending=False)
+
+                    n_pages = math.ceil(len(display_news) / NEWS_PAGE_SIZE)
+                    page = 1
+                    if n_pages > 1:
+                        page = st.selectbox("Page", options=range(1, n_pages + 1))
+
+                    start = (page - 1) * NEWS_PAGE_SIZE
+                    st.markdown(
+                        render_news_table(display_news.iloc[start : start + NEWS_PAGE_SIZE]),
+                        unsafe_allow_html=True,
+                    )
+                else:
+                    st.info("No relevant news items found for the selected period.")
 
 
 if __name__ == "__main__":
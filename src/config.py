@@ -12,6 +12,9 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     # Database Settings
     DB_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # seconds
     URL_DICT: list[dict[str, str]] = [
         {
             "ticker": "1155.KL",
@@ -36,6 +39,17 @@ class Settings(BaseSettings):
     ]
     TICKER_LIST: list = ["1155.KL", "1066.KL", "6947.KL", "AMZN"]
 
+    # Model Settings
+    # Benchmark the fp32 model under torch.compile (Inductor) against int8 once, keep the faster
+    # The outcome is saved under models/ and reused on restart
+    MODEL_TORCH_COMPILE: bool = False
+    # On CPUs with native bf16, benchmark bf16 autocast against int8 once and keep the faster
+    # The outcome is saved under models/ and reused on restart
+    MODEL_BF16: bool = True
+    # Intra-op threads for torch and ONNX Runtime, also seeds OMP/MKL_NUM_THREADS
+    # Defaults to every core
+    TORCH_THREADS: Optional[int] = None
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
 
 
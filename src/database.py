@@ -18,8 +18,11 @@ from sqlalchemy import (
     Integer,
     String,
     Text,
+    UniqueConstraint,
     create_engine,
+    text,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -34,7 +37,17 @@ structlog.configure(
 )
 logger = structlog.get_logger()
 
-engine = create_engine(settings.DB_URL)
+# Pool sizing only applies to server databases, sqlite (tests) keeps its default pool
+if make_url(settings.DB_URL).get_backend_name() == "sqlite":
+    engine = create_engine(settings.DB_URL)
+else:
+    engine = create_engine(
+        settings.DB_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -50,15 +63,24 @@ class Sentiment(Base):
     headline = Column(Text, nullable=False)
     sentiment_score = Column(Float, nullable=False)
     sentiment_label = Column(String(10), nullable=False)
-    link = Column(Text, nullable=True, unique=True)
+    link = Column(Text, nullable=True)
     published_at = Column(DateTime, nullable=False)
 
-    # __table_args__ = Index("idx_ticker_published", "ticker", "published_at")
+    __table_args__ = (
+        Index("idx_ticker_published", "ticker", "published_at"),
+        # Conflict target for bulk inserts from the staging table
+        UniqueConstraint("link", name="uq_sentiment_link"),
+    )
+
+
+# UNLOGGED staging table for bulk COPY of sentiment rows (skips WAL)
+SENTIMENT_STAGE_TABLE = "sentiment_stage"
 
 
 class Price(Base):
     __tablename__ = "price"
 
+    # Composite primary key (ticker, timestamp) already serves ticker + time range lookups
     ticker = Column(String(10), primary_key=True, nullable=False)
     close_price = Column(Float, nullable=False)
     volume = Column(BigInteger, nullable=False)
@@ -74,6 +96,16 @@ def init_db():
     while retries > 0:
         try:
             Base.metadata.create_all(bind=engine)
+            # create_all skips indexes on tables that already exist
+            for index in Sentiment.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        f"CREATE UNLOGGED TABLE IF NOT EXISTS {SENTIMENT_STAGE_TABLE} "
+                        "(LIKE sentiment INCLUDING DEFAULTS)"
+                    )
+                )
             log.info("db_table_setup_successful")
             break
         except OperationalError as e:
@@ -0,0 +1,55 @@
+"""
+One-off cleanup for sentiment rows duplicated by the link hash change
+
+- Link hashes moved from MD5 to xxh3-128, so headlines still in the feeds were inserted once more
+- The raw URL is not stored, old rows cannot be re-hashed to match
+- Duplicates share (ticker, headline, published_at), the newer row (higher id) is deleted
+
+Run once after the first pipeline run on the new hash:
+    docker compose exec worker python src/dedupe_sentiment.py
+"""
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import engine
+
+logger = structlog.get_logger()
+
+# Plain subquery instead of DELETE ... USING so it also runs on sqlite
+DEDUPE_QUERY = text("""
+    DELETE FROM sentiment
+    WHERE id IN (
+        SELECT newer.id
+        FROM sentiment newer
+        JOIN sentiment older
+            ON newer.ticker = older.ticker
+            AND newer.headline = older.headline
+            AND newer.published_at = older.published_at
+            AND newer.id > older.id
+    )
+""")
+
+
+def dedupe_sentiment(db_engine=engine) -> int:
+    """
+    Delete the newer of sentiment rows sharing (ticker, headline, published_at)
+
+    Return:
+        number of rows deleted
+    """
+    log = logger.bind(task="dedupe_sentiment")
+
+    try:
+        with db_engine.begin() as conn:
+            deleted = conn.execute(DEDUPE_QUERY).rowcount
+        log.info("dedupe_successful", rows_deleted=deleted)
+        return deleted
+    except SQLAlchemyError as e:
+        log.error("dedupe_failed", error=str(e))
+        raise
+
+
+if __name__ == "__main__":
+    dedupe_sentiment()
@@ -6,14 +6,15 @@ Ingest and extract data from news feed and stock price
 - output these data to the database
 """
 
-import hashlib
+import asyncio
+import io
 
+import aiohttp
 import feedparser
 import pandas as pd
 import structlog
+import xxhash
 import yfinance as yf
-from dateutil import parser
-from sqlalchemy import bindparam, text
 
 # Logging setup
 structlog.configure(
@@ -25,6 +26,29 @@ structlog.configure(
 )
 logger = structlog.get_logger()
 
+FEED_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+
+async def _fetch_feed(session: aiohttp.ClientSession, url: str) -> bytes:
+    async with session.get(url) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+async def _fetch_feeds(url_dict) -> list:
+    """
+    Download all rss feeds concurrently
+
+    return:
+        list of raw feed bodies (or the raised exception) in the same order as url_dict
+    """
+    headers = {"User-Agent": feedparser.USER_AGENT}
+    async with aiohttp.ClientSession(timeout=FEED_TIMEOUT, headers=headers) as session:
+        return await asyncio.gather(
+            *[_fetch_feed(session, item["feed_url"]) for item in url_dict],
+            return_exceptions=True,
+        )
+
 
 def fetch_rss_feed(url_dict, db_engine) -> pd.DataFrame:
     """
@@ -40,40 +64,46 @@ def fetch_rss_feed(url_dict, db_engine) -> pd.DataFrame:
         pd.DataFrame containing published_at, headline, ticker, alias, link
     """
     log = logger.bind(task="fetch_rss_feed")
-    news_item = []
+    # Collected column-wise, one list per output column
+    headlines, tickers, aliases, links, raw_dates = [], [], [], [], []
 
     try:
-        for item in url_dict:
+        bodies = asyncio.run(_fetch_feeds(url_dict))
+
+        for item, body in zip(url_dict, bodies):
             ticker = item["ticker"]
             alias = item["alias"]
-            url = item["feed_url"]
 
-            feed = feedparser.parse(url)
-
-            for entry in feed.entries:
-                try:
-                    pub_date = parser.parse(entry.published)
-                except:
-                    pub_date = pd.Timestamp.now(tz="UTC")
-
-                ori_link = entry.link
+            if isinstance(body, Exception):
+                log.warning("rss_feed_download_failed", ticker=ticker, error=str(body))
+                continue
 
-                hashed_link = hashlib.md5(ori_link.encode("utf-8")).hexdigest()
+            feed = feedparser.parse(body)
+            entries = feed.entries
 
-                news_item.append({
-                    "headline": entry.title,
-                    "ticker": ticker,
-                    "alias": alias,
-                    "link": hashed_link,
-                    "published_at": pub_date,
-                })
+            headlines.extend(entry.title for entry in entries)
+            # Non-cryptographic hash is enough for a dedup key
+            links.extend(xxhash.xxh3_128_hexdigest(entry.link.encode("utf-8")) for entry in entries)
+            raw_dates.extend(getattr(entry, "published", None) for entry in entries)
+            tickers.extend([ticker] * len(entries))
+            aliases.extend([alias] * len(entries))
 
-        if not news_item:
+        if not headlines:
             log.warning("no_rss_items_found")
             return pd.DataFrame()
 
-        df_new = pd.DataFrame(news_item)
-        df_new["published_at"] = pd.to_datetime(df_new["published_at"], utc=True)
+        df_new = pd.DataFrame({
+            "headline": headlines,
+            "ticker": tickers,
+            "alias": aliases,
+            "link": links,
+        })
+        # Parse all dates in one call, unparseable or missing dates fall back to now
+        df_new["published_at"] = pd.to_datetime(
+            pd.Series(raw_dates, dtype=object), utc=True, format="mixed", errors="coerce"
+        ).fillna(pd.Timestamp.now(tz="UTC"))
+        # Sorted by the sentiment index key so downstream inserts hit pages in order
+        df_new = df_new.sort_values(["ticker", "published_at"]).reset_index(drop=True)
 
     except Exception as e:
         log.exception("rss_fetch_failed", error=str(e))
@@ -81,26 +111,36 @@ def fetch_rss_feed(url_dict, db_engine) -> pd.DataFrame:
 
     # Deduplication
     try:
-        links_to_check = tuple(df_new["link"].unique())
+        links_to_check = df_new["link"].unique()
 
-        if not links_to_check:
+        if len(links_to_check) == 0:
             return pd.DataFrame()
 
-        # Query table
-        query = text(f"SELECT link FROM sentiment WHERE link IN :link")
-        query = query.bindparams(bindparam("link", expanding=True))
-
-        with db_engine.connect() as conn:
-            existing_links_df = pd.read_sql(query, conn, params={"link": links_to_check})
-
-        existing_links_set = set(existing_links_df["link"].tolist())
-
-        df_final = df_new[~df_new["link"].isin(existing_links_set)].copy()
+        # Upload candidate links and let Postgres anti-join them against the table
+        conn = db_engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "CREATE TEMP TABLE candidate_links (link TEXT PRIMARY KEY) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                "COPY candidate_links (link) FROM STDIN", io.StringIO("\n".join(links_to_check))
+            )
+            cursor.execute(
+                "SELECT c.link FROM candidate_links c "
+                "WHERE NOT EXISTS (SELECT 1 FROM sentiment s WHERE s.link = c.link)"
+            )
+            new_links = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+        finally:
+            conn.close()
+
+        df_final = df_new[df_new["link"].isin(new_links)].reset_index(drop=True)
 
         log.info(
             "deduplication_complete",
             fetched=len(df_new),
-            duplicates=len(existing_links_df),
+            duplicates=len(links_to_check) - len(new_links),
             news_item=len(df_final),
         )
 
@@ -129,8 +169,8 @@ def fetch_price(tickers, start_date, end_date) -> pd.DataFrame:
     if not tickers:
         return pd.DataFrame(columns=["timestamp", "ticker", "close", "volume"])
 
-    # Ensure list does not contain duplicates
-    tickers = list(set(tickers))
+    # Ensure list does not contain duplicates, keeping the caller's order
+    tickers = list(dict.fromkeys(tickers))
 
     # Download price data in batch
     try:
@@ -146,58 +186,39 @@ def fetch_price(tickers, start_date, end_date) -> pd.DataFrame:
         return pd.DataFrame(columns=["timestamp", "ticker", "close", "volume"])
 
     is_multi_index = isinstance(raw_data.columns, pd.MultiIndex)
-    # Iterate through each ticker
-    dfs = []
-    for t in tickers:
-        try:
-            if is_multi_index:
-                if t in raw_data.columns.get_level_values(0):
-                    df = raw_data[t].copy()
-                else:
-                    continue
-            else:
-                if len(tickers) == 1 and tickers[0] == t:
-                    df = raw_data.copy()
-                else:
-                    continue
-
-            if df.empty or df["Close"].isna().all():
-                log.warning("ticker_data_empty_or_nan", ticker=t)
-                continue
-
-            df = df.dropna(subset=["Close"])
-
-            # Reset index so Date becomes a column
-            df = df.reset_index()
-            # Add ticker column
-            df["ticker"] = t
-
-            # Rename columns
-            target_cols = {"Date": "timestamp", "Close": "close_price", "Volume": "volume"}
-            df = df.rename(columns=target_cols)
-
-            try:
-                # Keep only columns we want
-                df = df[["timestamp", "ticker", "close_price", "volume"]]
-            except KeyError as e:
-                log.warning("column_missing", columns=df.columns.tolist(), ticker=t)
-                continue
+    try:
+        if is_multi_index:
+            # Reshape (Date x [Ticker, Price]) into long (Date, Ticker) rows in one pass
+            df = raw_data.stack(level=0, future_stack=True)
+            df = df.rename_axis(["timestamp", "ticker"]).reset_index()
+        elif len(tickers) == 1:
+            df = raw_data.rename_axis("timestamp").reset_index()
+            df["ticker"] = tickers[0]
+        else:
+            log.warning("unexpected_price_layout", columns=raw_data.columns.tolist())
+            return pd.DataFrame(columns=["timestamp", "ticker", "close_price", "volume"])
+
+        # Rename columns and keep only columns we want
+        df = df.rename(columns={"Close": "close_price", "Volume": "volume"})
+        df = df[["timestamp", "ticker", "close_price", "volume"]]
+        df.columns.name = None
+
+    except KeyError as e:
+        log.warning("column_missing", columns=raw_data.columns.tolist(), error=str(e))
+        return pd.DataFrame(columns=["timestamp", "ticker", "close_price", "volume"])
 
-            dfs.append(df)
+    df = df.dropna(subset=["close_price"])
 
-        except KeyError as e:
-            log.warning("processing_failed_key_error", ticker=t, error=str(e))
-            continue
-        except Exception as e:
-            log.error("processing_failed", ticker=t, error=str(e))
-            continue
+    missing_tickers = set(tickers) - set(df["ticker"].unique())
+    if missing_tickers:
+        log.warning("ticker_data_empty_or_nan", tickers=sorted(missing_tickers))
 
-    if not dfs:
+    if df.empty:
         log.warning("no_valid_data_extracted")
         return pd.DataFrame(columns=["timestamp", "ticker", "close_price", "volume"])
 
-    # Consolidate
-    final_df = pd.concat(dfs, ignore_index=True)
+    # Sorted by primary key so downstream inserts hit pages in order
+    final_df = df.sort_values(["ticker", "timestamp"]).reset_index(drop=True)
     # Standardize timezone
     final_df["timestamp"] = pd.to_datetime(final_df["timestamp"], utc=True)
     log.info("price_fetch_success", total_rows=len(final_df))
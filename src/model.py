@@ -2,12 +2,27 @@
 Classify the rss feed headlines with sentiment and sentiment score
 """
 
+import hashlib
+import json
+import os
+import platform
+import time
+from collections import OrderedDict
+
+# Sets OMP/MKL thread counts, has to run before torch is imported
+from runtime import NUM_THREADS  # isort: skip
+
+import numpy as np
+import onnxruntime as ort
 import pandas as pd
 import structlog
 import torch
-from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
 from transformers.models.auto.tokenization_auto import AutoTokenizer
 
+from config import settings
+
 structlog.configure(
     processors=[
         structlog.processors.add_log_level,
@@ -17,6 +32,49 @@ structlog.configure(
 )
 logger = structlog.get_logger()
 
+# Headlines per forward pass
+BATCH_SIZE = 32
+# Token cap per headline, financial headlines rarely exceed 30 tokens
+MAX_LENGTH = 64
+# Headlines sampled for the token length stats log
+LENGTH_SAMPLE_SIZE = 1000
+# Exported ONNX graphs and quantized weights, reused across restarts
+MODEL_DIR = "models"
+ONNX_OPSET = 17
+# Headlines kept in the prediction cache, least recently used evicted first
+CACHE_SIZE = 50_000
+# Headlines with fewer words than this, or no letters, are scored neutral without the model
+MIN_WORDS = 2
+# Batch sizes run once at init so kernel selection and workspaces are set up before the first tick
+WARMUP_BATCH_SIZES = (1, 8, BATCH_SIZE)
+# Synthetic headlines for warm-up and for timing the int8 runtime against fp32 candidates at init
+CALIBRATION_HEADLINES = [
+    template.format(company=company)
+    for company in ("Maybank", "RHB", "Celcomdigi", "Amazon", "Tenaga", "Petronas", "CIMB", "Apple")
+    for template in (
+        "{company} shares rise after quarterly profit beats estimates",
+        "{company} cuts full-year guidance as costs climb",
+        "{company} to hold annual general meeting next month",
+        "Analysts downgrade {company} on weaker loan growth outlook",
+        "{company} announces dividend in line with expectations",
+        "Regulator fines {company} over disclosure lapses",
+        "{company} expands into new markets with acquisition deal worth billions",
+        "{company}",
+    )
+]
+
+
+def _cpu_flags() -> set[str]:
+    """CPU feature flags from /proc/cpuinfo, empty where unavailable"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
 
 class SentimenClassifier:
     def __init__(self):
@@ -24,37 +82,450 @@ class SentimenClassifier:
         Model: "mrm8488/distilroberta-finetuned-financial-news-sentiment-analysis"
         Quantization: Int8
         Device: CPU
-        Quantization engine: qnnpack
+        Quantization engine: fbgemm on x86, qnnpack otherwise
+        Inference: length-sorted batches, each padded to its own longest headline
+        Runtime: ONNX Runtime on the int8 ONNX export (TorchScript trace of the quantized model as fallback)
+                 or torch.compile on the fp32 model when MODEL_TORCH_COMPILE is set and it benchmarks faster
+                 or bf16 autocast on CPUs with native bf16 when it benchmarks faster than int8
         """
         logger.info("loading_sentiment_model")
         self.model_name = "mrm8488/distilroberta-finetuned-financial-news-sentiment-analysis"
+        model_stem = self.model_name.replace("/", "--")
+        self.onnx_path = os.path.join(MODEL_DIR, f"{model_stem}.onnx")
+        self.onnx_int8_path = os.path.join(MODEL_DIR, f"{model_stem}-int8.onnx")
+        self.model_stem = model_stem
+        self.session = None
+        self._model_fp32 = None
+        # torch.compile'd or bf16 autocast fp32 model, only set when it times faster than int8
+        self.fp32_runner = None
+        self.fp32_runtime: str | None = None
+        # headline -> (label, score), RSS feeds republish the same headline across sources
+        self._cache: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        # Token lengths seen so far, logged once to validate MAX_LENGTH
+        self._length_sample: list[int] = []
 
         try:
             # Quantization engine
-            # TODO: this might need to be changed or remove to use default for specific EC2 instance
-            torch.backends.quantized.engine = "qnnpack"
+            # fbgemm dispatches to AVX2/AVX512-VNNI int8 kernels on x86, qnnpack targets ARM
+            is_x86 = platform.machine() in ("x86_64", "AMD64")
+            if is_x86 and "fbgemm" in torch.backends.quantized.supported_engines:
+                quant_engine = "fbgemm"
+            else:
+                quant_engine = "qnnpack"
+            torch.backends.quantized.engine = quant_engine
+
+            # Use every core for intra-op work, inter-op parallelism only adds contention
+            torch.set_num_threads(NUM_THREADS)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # Can only be set once per process, before any inter-op work
+                pass
+            logger.info(
+                "torch_threads_configured",
+                intra_op=torch.get_num_threads(),
+                inter_op=torch.get_num_interop_threads(),
+                omp=os.environ.get("OMP_NUM_THREADS"),
+                mkl=os.environ.get("MKL_NUM_THREADS"),
+            )
 
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            model_fp32 = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            # torchscript=True returns plain (logits,) tuples, which tracing requires
+            self.model_config = AutoConfig.from_pretrained(self.model_name, torchscript=True)
 
-            # Apply quantization
-            logger.info("quantizing_model", engine="qnnpack", dtype="qint8")
-            self.model_int8 = torch.quantization.quantize_dynamic(
-                model_fp32, {torch.nn.Linear}, dtype=torch.qint8
+            self.id2label = self.model_config.id2label
+            # Label name and score sign (-1 negative, 1 positive, 0 neutral) per class index
+            self.labels = np.array([self.id2label[i] for i in range(len(self.id2label))])
+            lowered = np.char.lower(self.labels)
+            self.label_sign = np.select(
+                [lowered == "negative", lowered == "positive"], [-1.0, 1.0], default=0.0
             )
+            self.neutral_label = self.labels[self.label_sign == 0.0][0]
 
-            # Initialize pipeline with model
-            # Uses CPU
-            self.nlp_pipeline = pipeline(
-                "text-classification", model=self.model_int8, tokenizer=self.tokenizer, device=-1
-            )
+            # ONNX Runtime int8 kernels beat PyTorch's qlinear_dynamic on x86
+            self.session = self._load_onnx_session()
+            runtime = "onnxruntime"
+
+            if self.session is None:
+                self.model_int8 = self._load_quantized_model(quant_engine)
+
+                # Called directly (CPU), no HF pipeline
+                self.model = self.model_int8.eval()
+                self.model_runner = self._trace_model()
+                if isinstance(self.model_runner, torch.jit.ScriptModule):
+                    runtime = "torchscript"
+                else:
+                    runtime = "eager"
+
+            cpu_flags = _cpu_flags()
+            if settings.MODEL_TORCH_COMPILE:
+                # fp32 only, Inductor regresses on dynamically quantized models
+                runtime = self._pick_fp32_runtime("torch_compile", runtime, cpu_flags)
+            # AVX512-BF16 / AMX can match int8 without activation requantization
+            bf16_cpu = {"avx512_bf16", "amx_bf16"} & cpu_flags
+            if self.fp32_runner is None and settings.MODEL_BF16 and bf16_cpu:
+                runtime = self._pick_fp32_runtime("bf16_autocast", runtime, cpu_flags)
 
-            logger.info("model_loaded_succesfully", quantized=True)
+            self._warm_up()
+
+            logger.info(
+                "model_loaded_succesfully",
+                quantized=self.fp32_runner is None,
+                runtime=runtime,
+            )
+            # fp32 weights are only needed to build the persisted artifacts
+            self._model_fp32 = None
 
         except Exception as e:
             logger.error("model_loading_failed", error=str(e))
             raise e
 
+    def _load_fp32(self):
+        """Load the fp32 weights from the HF hub (or its cache), once"""
+        if self._model_fp32 is None:
+            logger.info("loading_fp32_weights", model=self.model_name)
+            self._model_fp32 = AutoModelForSequenceClassification.from_pretrained(
+                self.model_name, config=self.model_config
+            )
+        return self._model_fp32
+
+    def _load_quantized_model(self, quant_engine: str):
+        """
+        Load the int8 torch model, quantizing and saving it on first run
+
+        On restart the saved state_dict is mmap-loaded into a quantized skeleton
+        built from the config, so no fp32 weights are loaded or quantized
+        """
+        # Packed int8 weights are engine specific
+        path = os.path.join(MODEL_DIR, f"{self.model_stem}-int8-{quant_engine}.pt")
+
+        if os.path.exists(path):
+            try:
+                skeleton = AutoModelForSequenceClassification.from_config(self.model_config)
+                model_int8 = torch.quantization.quantize_dynamic(
+                    skeleton, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                model_int8.load_state_dict(
+                    torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+                )
+                logger.info("quantized_model_loaded", path=path)
+                return model_int8
+            except Exception as e:
+                logger.warning("quantized_model_load_failed_requantizing", error=str(e))
+
+        # Apply quantization
+        logger.info("quantizing_model", engine=quant_engine, dtype="qint8")
+        model_int8 = torch.quantization.quantize_dynamic(
+            self._load_fp32(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        try:
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            torch.save(model_int8.state_dict(), path)
+            logger.info("quantized_model_saved", path=path)
+        except OSError as e:
+            logger.warning("quantized_model_save_failed", error=str(e))
+        return model_int8
+
+    def _export_onnx(self, model_fp32) -> None:
+        """
+        Export the fp32 model to ONNX and quantize its MatMul weights to int8
+
+        Inputs are (input_ids, attention_mask) with dynamic batch and sequence axes
+        """
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        example = self.tokenizer("x", return_tensors="pt")
+        logger.info("exporting_onnx_model", path=self.onnx_path, opset=ONNX_OPSET)
+        with torch.no_grad():
+            torch.onnx.export(
+                model_fp32.eval(),
+                (example["input_ids"], example["attention_mask"]),
+                self.onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=ONNX_OPSET,
+                dynamo=False,
+            )
+
+        logger.info("quantizing_onnx_model", path=self.onnx_int8_path, dtype="qint8")
+        quantize_dynamic(
+            self.onnx_path,
+            self.onnx_int8_path,
+            weight_type=QuantType.QInt8,
+            op_types_to_quantize=["MatMul"],
+        )
+
+    def _load_onnx_session(self) -> ort.InferenceSession | None:
+        """
+        Build an ONNX Runtime session on the int8 model, exporting it first if missing
+
+        Returns None if export or session creation fails so the torch path is used
+        """
+        try:
+            if not os.path.exists(self.onnx_int8_path):
+                self._export_onnx(self._load_fp32())
+
+            so = ort.SessionOptions()
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            so.intra_op_num_threads = NUM_THREADS
+            so.inter_op_num_threads = 1
+            session = ort.InferenceSession(
+                self.onnx_int8_path, sess_options=so, providers=["CPUExecutionProvider"]
+            )
+            logger.info("onnx_session_created", path=self.onnx_int8_path)
+            return session
+        except Exception as e:
+            logger.warning("onnx_session_failed_using_torch", error=str(e))
+            return None
+
+    def _trace_model(self):
+        """
+        Trace and freeze the quantized model to skip eager-mode Python dispatch per op
+
+        Falls back to the eager model if tracing fails or the trace does not return a
+        (logits,) tuple, both take (input_ids, attention_mask)
+        """
+        try:
+            example = self.tokenizer(
+                "x", return_tensors="pt", padding="max_length", max_length=MAX_LENGTH
+            )
+            inputs = (example["input_ids"], example["attention_mask"])
+            with torch.no_grad():
+                traced = torch.jit.freeze(torch.jit.trace(self.model, inputs, strict=False))
+                # Newer transformers ignore torchscript=True and trace to a dict output,
+                # _logits indexes [0] which only eager ModelOutput and tuples support
+                output = traced(*inputs)
+            if not isinstance(output, tuple):
+                raise TypeError(f"traced model returned {type(output).__name__}, not a tuple")
+            logger.info("model_traced", runtime="torchscript")
+            return traced
+        except Exception as e:
+            logger.warning("model_trace_failed_using_eager", error=str(e))
+            return self.model
+
+    def _warm_up(self) -> None:
+        """
+        Run each warm-up batch size once through the chosen runtime
+
+        Bypasses the prediction cache and pre-filter so every shape reaches the model
+        """
+        start = time.perf_counter()
+        for size in WARMUP_BATCH_SIZES:
+            self._predict(CALIBRATION_HEADLINES[:size])
+        # Warm-up headlines should not count towards the token length stats
+        self._length_sample = []
+        logger.info("model_warmed_up", seconds=time.perf_counter() - start)
+
+    def _benchmark(self) -> float:
+        """Best of two timed runs over CALIBRATION_HEADLINES, in seconds"""
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            self._predict(CALIBRATION_HEADLINES)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def _build_fp32_runner(self, candidate: str):
+        """fp32 model for a candidate runtime, compiled with Inductor for torch_compile"""
+        model = self._load_fp32().eval()
+        if candidate == "torch_compile":
+            return torch.compile(model, backend="inductor", mode="max-autotune", dynamic=True)
+        return model
+
+    def _pick_fp32_runtime(self, candidate: str, int8_runtime: str, cpu_flags: set[str]) -> str:
+        """
+        Time the int8 runtime against an fp32 candidate, keep the faster
+
+        Candidates: torch_compile (Inductor) or bf16_autocast
+        The outcome is saved under MODEL_DIR keyed by int8 runtime, torch version and CPU flags,
+        so restarts on the same host reuse it and only load fp32 weights when the candidate won
+
+        Return:
+            the runtime in use, candidate if it won, int8_runtime otherwise
+        """
+        path = os.path.join(MODEL_DIR, f"{self.model_stem}-{candidate}-choice.json")
+        key = {
+            "int8_runtime": int8_runtime,
+            "torch": torch.__version__,
+            "cpu": hashlib.sha256(" ".join(sorted(cpu_flags)).encode()).hexdigest(),
+        }
+
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+
+        if saved.get("key") == key:
+            logger.info("fp32_choice_reused", candidate=candidate, path=path, wins=saved["wins"])
+            if not saved["wins"]:
+                return int8_runtime
+            try:
+                self.fp32_runner = self._build_fp32_runner(candidate)
+                self.fp32_runtime = candidate
+                return candidate
+            except Exception as e:
+                logger.warning("fp32_load_failed_using_int8", candidate=candidate, error=str(e))
+                return int8_runtime
+
+        int8_seconds = self._benchmark()
+
+        try:
+            self.fp32_runner = self._build_fp32_runner(candidate)
+            self.fp32_runtime = candidate
+            # The first of the two runs absorbs torch.compile's compilation
+            candidate_seconds = self._benchmark()
+        except Exception as e:
+            logger.warning("fp32_benchmark_failed_using_int8", candidate=candidate, error=str(e))
+            candidate_seconds = None
+        # Calibration headlines should not count towards the token length stats
+        self._length_sample = []
+
+        logger.info(
+            "fp32_benchmark",
+            candidate=candidate,
+            int8_seconds=int8_seconds,
+            candidate_seconds=candidate_seconds,
+        )
+        wins = candidate_seconds is not None and candidate_seconds < int8_seconds
+
+        # A failed candidate run is not saved, it may be a transient hub or load error
+        if candidate_seconds is not None:
+            try:
+                os.makedirs(MODEL_DIR, exist_ok=True)
+                with open(path, "w") as f:
+                    json.dump({"key": key, "wins": wins}, f)
+            except OSError as e:
+                logger.warning("fp32_choice_save_failed", candidate=candidate, error=str(e))
+
+        if not wins:
+            self.fp32_runner = None
+            self.fp32_runtime = None
+            return int8_runtime
+        return candidate
+
+    def _logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        Forward pass on one padded batch of int64 arrays
+        """
+        input_ids = input_ids.astype(np.int64, copy=False)
+        attention_mask = attention_mask.astype(np.int64, copy=False)
+        if self.fp32_runner is not None:
+            # autocast is disabled for torch_compile, which runs plain fp32
+            bf16 = self.fp32_runtime == "bf16_autocast"
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+                logits = self.fp32_runner(
+                    torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+                )[0]
+            return logits.float().numpy()
+        if self.session is not None:
+            return self.session.run(
+                ["logits"], {"input_ids": input_ids, "attention_mask": attention_mask}
+            )[0]
+        logits = self.model_runner(torch.from_numpy(input_ids), torch.from_numpy(attention_mask))[0]
+        return logits.numpy()
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return shifted / shifted.sum(axis=-1, keepdims=True)
+
+    def _log_token_lengths(self, lengths: list[int]) -> None:
+        """Log token length percentiles once the first LENGTH_SAMPLE_SIZE headlines are seen"""
+        if len(self._length_sample) >= LENGTH_SAMPLE_SIZE:
+            return
+
+        self._length_sample.extend(lengths[: LENGTH_SAMPLE_SIZE - len(self._length_sample)])
+        if len(self._length_sample) == LENGTH_SAMPLE_SIZE:
+            sample = np.asarray(self._length_sample)
+            logger.info(
+                "token_length_stats",
+                p50=float(np.percentile(sample, 50)),
+                p99=float(np.percentile(sample, 99)),
+                truncated=int((sample >= MAX_LENGTH).sum()),
+                max_length=MAX_LENGTH,
+            )
+
+    def _predict(self, headlines: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Batched inference on headlines
+
+        Headlines are tokenized once, sorted by token length and split into batches
+        so padding is kept to a minimum. Results are returned in the input order.
+
+        Return:
+            labels and sentiment scores (-1 to 1) per headline
+        """
+        encoded = self.tokenizer(headlines, truncation=True, max_length=MAX_LENGTH)
+        input_ids = encoded["input_ids"]
+        attention_mask = encoded["attention_mask"]
+        lengths = [len(ids) for ids in input_ids]
+        self._log_token_lengths(lengths)
+        order = np.argsort(lengths, kind="stable")
+
+        probs = np.empty((len(headlines), len(self.id2label)), dtype=np.float32)
+        with torch.inference_mode(), torch.jit.optimized_execution(True):
+            for start in range(0, len(order), BATCH_SIZE):
+                idx = order[start : start + BATCH_SIZE]
+                batch = self.tokenizer.pad(
+                    {
+                        "input_ids": [input_ids[i] for i in idx],
+                        "attention_mask": [attention_mask[i] for i in idx],
+                    },
+                    return_tensors="np",
+                )
+                logits = self._logits(batch["input_ids"], batch["attention_mask"])
+                probs[idx] = self._softmax(logits)
+
+        # Confidence signed by label: -ve for negative, as is for positive, 0 for neutral
+        label_idx = probs.argmax(axis=1)
+        confidence = probs[np.arange(len(label_idx)), label_idx].astype(np.float64)
+        return self.labels[label_idx], self.label_sign[label_idx] * confidence
+
+    @staticmethod
+    def _is_classifiable(headline: str) -> bool:
+        """Cheap pre-filter for empty, numeric-only or single-token headlines"""
+        return len(headline.split()) >= MIN_WORDS and any(c.isalpha() for c in headline)
+
+    def _predict_cached(self, headlines: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Run the model only on unique headlines not already in the cache
+
+        Headlines failing the pre-filter are never sent to the model and come back neutral
+
+        Return:
+            labels and sentiment scores per headline, in the input order
+        """
+        uniq, inverse = np.unique(np.asarray(headlines, dtype=object), return_inverse=True)
+        misses = [h for h in uniq if h not in self._cache and self._is_classifiable(h)]
+        logger.debug("prediction_cache", unique=len(uniq), misses=len(misses))
+
+        if misses:
+            labels, scores = self._predict(misses)
+            self._cache.update(zip(misses, zip(labels.tolist(), scores.tolist())))
+
+        skipped = (self.neutral_label, 0.0)
+        cached = []
+        for h in uniq:
+            hit = self._cache.get(h)
+            if hit is None:
+                cached.append(skipped)
+            else:
+                # Most recently used entries sit at the end
+                self._cache.move_to_end(h)
+                cached.append(hit)
+        labels = np.array([c[0] for c in cached])
+        scores = np.array([c[1] for c in cached], dtype=np.float64)
+
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+        return labels[inverse], scores[inverse]
+
     def classify(self, news_df: pd.DataFrame) -> pd.DataFrame:
         """
         Classify the headline column
@@ -73,34 +544,13 @@ class SentimenClassifier:
             return news_df
 
         try:
-            headlines = news_df["headline"].tolist()
+            headlines = news_df["headline"].fillna("").astype(str).tolist()
             log.info("processing_headlines", count=len(headlines))
 
-            results = self.nlp_pipeline(headlines, truncation=True, max_length=512)
-
-            # Calculate sentiment score (-1 to 1) from negative to positive
-            scores = []
-            labels = []
-            for res in results:
-                label = res["label"]
-                confidence = res["score"]
-
-                labels.append(label)
-
-                # Convert model confidence to -ve for negative sentiment
-                if label.lower() == "negative":
-                    scores.append(confidence * -1)
-                # For positive keep as is
-                elif label.lower() == "positive":
-                    scores.append(confidence)
-                # For neutral change to 0
-                else:
-                    scores.append(0.0)
+            labels, scores = self._predict_cached(headlines)
 
-            # Create copy to prevent SettingWithCopy warnings
-            result_df = news_df.copy()
-            result_df["sentiment_label"] = labels
-            result_df["sentiment_score"] = scores
+            # New frame sharing the input columns, no full copy of news_df
+            result_df = news_df.assign(sentiment_label=labels, sentiment_score=scores)
 
             log.info("classification_complete")
             return result_df
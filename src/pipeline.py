@@ -2,16 +2,20 @@
 Pipeline module
 """
 
+import asyncio
+import io
 import time
 from datetime import datetime, timezone
 
 import pandas as pd
+import psycopg2
 import structlog
+from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
 
 from config import settings
-from database import Price, Sentiment, engine, init_db
+from database import SENTIMENT_STAGE_TABLE, Price, engine, init_db
 from ingestion import fetch_price, fetch_rss_feed
 from model import SentimenClassifier
 
@@ -25,6 +29,25 @@ structlog.configure(
 )
 logger = structlog.get_logger()
 
+# Derived frames share column buffers until written to, instead of defensive copies
+pd.set_option("mode.copy_on_write", True)
+
+# Rows per INSERT statement in db_writer, keeps dicts and bind params bounded
+DB_WRITE_CHUNK = 1000
+
+SENTIMENT_COLUMNS = [
+    "ticker",
+    "alias",
+    "headline",
+    "sentiment_score",
+    "sentiment_label",
+    "link",
+    "published_at",
+]
+# COPY csv reads a bare empty field as NULL, these keep empty strings as ''
+# (classify passes empty headlines through as neutral, the old INSERT stored them as '')
+SENTIMENT_TEXT_COLUMNS = ["ticker", "alias", "headline", "sentiment_label", "link"]
+
 
 class Pipeline:
     def __init__(self):
@@ -34,18 +57,23 @@ class Pipeline:
         self.interval_seconds = 5 * 60  # Pipeline run interval
         self.classifier = SentimenClassifier()
         self.url_dict = settings.URL_DICT
-        self.ticker_list = settings.TICKER_LIST
+        # Deduplicated once here rather than per fetch
+        self.ticker_list = list(dict.fromkeys(settings.TICKER_LIST))
         self.db_engine = engine
         # To keep track of the latest price fetch to prevent redundant calls
         self.latest_price_fetch = self._get_time_mark()
 
     def _get_time_mark(self):
-        """Helper function to get the initial time mark from db"""
+        """
+        Helper function to get the initial time mark from db
+
+        Only needed once at startup, run_pipeline keeps latest_price_fetch current after that
+        """
         try:
-            query = "SELECT MAX(timestamp) FROM price"
-            result = pd.read_sql(query, self.db_engine)
-            if not result.empty and result.iloc[0, 0] is not None:
-                return pd.to_datetime(result.iloc[0, 0], utc=True)
+            with self.db_engine.connect() as conn:
+                latest = conn.execute(text("SELECT MAX(timestamp) FROM price")).scalar()
+            if latest is not None:
+                return pd.to_datetime(latest, utc=True)
         except Exception as e:
             logger.error("failed_to_fetch_initial_time_mark", error=str(e))
         return None
@@ -60,24 +88,78 @@ class Pipeline:
             log.info("skipping_db_write", reason="dataframe_empty")
             return
 
-        data = df.to_dict(orient="records")
-
         try:
             log.info("writing_to_db", row_count=len(df))
-            stmt = insert(table_name).values(data)
-            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_cols)
             with self.db_engine.begin() as conn:
-                conn.execute(stmt)
-                log.info("write_successful", rows=len(data))
+                for start in range(0, len(df), DB_WRITE_CHUNK):
+                    data = df.iloc[start : start + DB_WRITE_CHUNK].to_dict(orient="records")
+                    stmt = insert(table_name).values(data)
+                    stmt = stmt.on_conflict_do_nothing(index_elements=conflict_cols)
+                    conn.execute(stmt)
+                log.info("write_successful", rows=len(df))
 
         except SQLAlchemyError as e:
             log.error("database_write_failed", error=str(e))
 
-    def ingestion_layer(self) -> tuple[pd.DataFrame, pd.DataFrame, datetime]:
+    def sentiment_writer(self, df: pd.DataFrame) -> None:
         """
-        Fetches data
+        Helper function to bulk write sentiment rows
+
+        COPY into the UNLOGGED staging table, then move new rows into sentiment
+        and clear the stage in one transaction
+        """
+        log = logger.bind(task="sentiment_writer", table=SENTIMENT_STAGE_TABLE)
+
+        if df.empty:
+            log.info("skipping_db_write", reason="dataframe_empty")
+            return
+
+        columns = ", ".join(SENTIMENT_COLUMNS)
+        not_null = ", ".join(SENTIMENT_TEXT_COLUMNS)
+        buffer = io.StringIO()
+        df[SENTIMENT_COLUMNS].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        conn = self.db_engine.raw_connection()
+        try:
+            log.info("writing_to_db", row_count=len(df))
+            cursor = conn.cursor()
+            cursor.copy_expert(
+                f"COPY {SENTIMENT_STAGE_TABLE} ({columns}) FROM STDIN "
+                f"WITH (FORMAT csv, FORCE_NOT_NULL ({not_null}))",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO sentiment ({columns}) SELECT {columns} FROM {SENTIMENT_STAGE_TABLE} "
+                "ON CONFLICT (link) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            cursor.execute(f"TRUNCATE {SENTIMENT_STAGE_TABLE}")
+            conn.commit()
+            log.info("write_successful", rows=inserted)
+
+        except psycopg2.Error as e:
+            conn.rollback()
+            log.error("database_write_failed", error=str(e))
+        finally:
+            conn.close()
+
+    async def _fetch_price_window(self, start_date, end_date: datetime) -> pd.DataFrame:
+        """Fetch prices for [start_date, end_date) on a worker thread"""
+        log = logger.bind(task="ingestion_layer")
+
+        if start_date >= end_date:
+            log.info("price_data_up_to_date")
+            return pd.DataFrame()
 
-        Args:
+        log.debug("fetching_price_data", start=start_date, end=end_date)
+        return await asyncio.to_thread(
+            fetch_price, tickers=self.ticker_list, start_date=start_date, end_date=end_date
+        )
+
+    async def ingestion_layer_async(self) -> tuple[pd.DataFrame, pd.DataFrame, datetime]:
+        """
+        Fetches data, RSS and price concurrently once the price window is known
 
         Returns:
             pd.DataFrame: two dataframes for RSS feed and price
@@ -94,32 +176,56 @@ class Pipeline:
         try:
             # Fetch RSS feed
             log.debug("fetching_rss_feed")
-            rss_df = fetch_rss_feed(url_dict=self.url_dict, db_engine=self.db_engine)
+            rss_fetch = asyncio.to_thread(
+                fetch_rss_feed, url_dict=self.url_dict, db_engine=self.db_engine
+            )
 
             # Fetch price based on latest fetch mark
             if self.latest_price_fetch:
-                start_date = self.latest_price_fetch
+                rss_result, price_result = await asyncio.gather(
+                    rss_fetch,
+                    self._fetch_price_window(self.latest_price_fetch, current_fetch_end),
+                    return_exceptions=True,
+                )
+                # Checked separately so a failed price fetch keeps this run's headlines
+                if isinstance(rss_result, BaseException):
+                    log.error("rss_fetch_failed", error=str(rss_result))
+                else:
+                    rss_df = rss_result
+                if isinstance(price_result, BaseException):
+                    log.error("price_fetch_failed", error=str(price_result))
+                else:
+                    price_df = price_result
             else:
+                # Cold start, the price window depends on the oldest headline
+                rss_df = await rss_fetch
                 if not rss_df.empty:
-                    min_rss_date = pd.to_datetime(rss_df["published_at"]).min()
+                    published_at = rss_df["published_at"]
+                    # fetch_rss_feed already returns datetime64, only parse other inputs
+                    if not pd.api.types.is_datetime64_any_dtype(published_at):
+                        published_at = pd.to_datetime(published_at, utc=True, errors="coerce")
+                    min_rss_date = published_at.min()
                     start_date = min_rss_date - pd.DateOffset(years=1)
                 else:
                     # Fallback if there are no new news, fetch based on pipeline interval
                     start_date = current_fetch_end - pd.Timedelta(seconds=self.interval_seconds)
-
-            if start_date < current_fetch_end:
-                log.debug("fetching_price_data", start=start_date, end=current_fetch_end)
-                price_df = fetch_price(
-                    tickers=self.ticker_list, start_date=start_date, end_date=current_fetch_end
-                )
-            else:
-                log.info("price_data_up_to_date")
+                price_df = await self._fetch_price_window(start_date, current_fetch_end)
 
         except Exception as e:
             log.error("ingestion_failed", error=str(e))
 
         return rss_df, price_df, current_fetch_end
 
+    def ingestion_layer(self) -> tuple[pd.DataFrame, pd.DataFrame, datetime]:
+        """
+        Fetches data
+
+        Returns:
+            pd.DataFrame: two dataframes for RSS feed and price
+            datetime: time marker to keep track of the latest price fetch
+        """
+        return asyncio.run(self.ingestion_layer_async())
+
     def inference_layer(self, rss_df: pd.DataFrame) -> pd.DataFrame:
         """
         Runs classifier on RSS feed data
@@ -142,17 +248,11 @@ class Pipeline:
             log.error("inference_failed", error=str(e))
             return pd.DataFrame()
 
-    def run_pipeline(self):
+    def price_layer(self, price_df: pd.DataFrame, fetch_time: datetime) -> None:
         """
-        Main execution flow
-        1. Ingestion -> write price to DB
-        2. Ingestion -> rss feed to Inference -> write to DB
+        Writes price to DB and advances the price time mark on success
         """
-        start_time = time.time()
-        log = logger.bind(task="run_pipeline")
-        log.info("run_pipeline_initiated")
-
-        rss_df, price_df, fetch_time = self.ingestion_layer()
+        log = logger.bind(task="price_layer")
 
         price_write_success = True
 
@@ -173,34 +273,100 @@ class Pipeline:
         else:
             log.warning("price_mark_update_skipped", reason="price_db_write_failed")
 
-        # INFERENCE
-        if not rss_df.empty:
-            classified_df = self.inference_layer(rss_df)
+    def sentiment_layer(self, rss_df: pd.DataFrame) -> None:
+        """
+        Classifies RSS feed data and writes it to DB
+        """
+        log = logger.bind(task="sentiment_layer")
 
-            if not classified_df.empty:
-                try:
-                    self.db_writer(classified_df, Sentiment, conflict_cols=["link"])
-                except Exception as e:
-                    log.error("rss_db_write_failed", error=str(e))
-            else:
-                log.info("inference_returned_empty_result")
-        else:
+        if rss_df.empty:
             log.info("no_rss_data_to_process")
+            return
+
+        classified_df = self.inference_layer(rss_df)
+
+        if not classified_df.empty:
+            try:
+                self.sentiment_writer(classified_df)
+            except Exception as e:
+                log.error("rss_db_write_failed", error=str(e))
+        else:
+            log.info("inference_returned_empty_result")
+
+    def run_pipeline(self):
+        """
+        Main execution flow
+        1. Ingestion -> write price to DB
+        2. Ingestion -> rss feed to Inference -> write to DB
+        """
+        start_time = time.time()
+        log = logger.bind(task="run_pipeline")
+        log.info("run_pipeline_initiated")
+
+        rss_df, price_df, fetch_time = self.ingestion_layer()
+        self.price_layer(price_df, fetch_time)
+        self.sentiment_layer(rss_df)
 
         duration = time.time() - start_time
         log.info("run_pipeline_finished", duration=duration)
 
-    def start(self):
+    async def run_pipeline_async(self, pending_rss: pd.DataFrame) -> pd.DataFrame:
+        """
+        Overlapped execution flow, double buffered across runs
+        1. Ingestion of this run, concurrently with
+           Inference on the previous run's rss feed -> write to DB
+        2. Write price to DB
+
+        Returns:
+            pd.DataFrame: this run's rss feed, to be classified during the next run
+        """
+        start_time = time.time()
+        log = logger.bind(task="run_pipeline")
+        log.info("run_pipeline_initiated", pending_rss=len(pending_rss))
+
+        ingestion = asyncio.create_task(self.ingestion_layer_async())
+        try:
+            await asyncio.to_thread(self.sentiment_layer, pending_rss)
+        finally:
+            rss_df, price_df, fetch_time = await ingestion
+
+        self.price_layer(price_df, fetch_time)
+
+        # Links still being written may not have been visible to this run's dedup query
+        if not rss_df.empty and not pending_rss.empty:
+            rss_df = rss_df[~rss_df["link"].isin(pending_rss["link"])].reset_index(drop=True)
+
+        duration = time.time() - start_time
+        log.info("run_pipeline_finished", duration=duration)
+        return rss_df
+
+    async def _run_forever(self):
         log = logger.bind(task="pipeline")
-        log.info("starting_pipeline", interval=self.interval_seconds)
+        pending_rss = pd.DataFrame()
 
+        # Runs are scheduled at t0 + k * interval so run duration does not accumulate as drift
+        t0 = time.monotonic()
+        k = 0
         while True:
+            drift = time.monotonic() - (t0 + k * self.interval_seconds)
+            log.info("pipeline_run_started", run=k, drift=round(drift, 3))
+
             try:
-                self.run_pipeline()
+                pending_rss = await self.run_pipeline_async(pending_rss)
             except Exception as e:
+                pending_rss = pd.DataFrame()
                 log.critical("pipeline_failure", error=str(e))
 
-            time.sleep(self.interval_seconds)
+            now = time.monotonic()
+            # Next slot after now, a run that overran its interval skips the missed slots
+            k = max(k + 1, int((now - t0) // self.interval_seconds) + 1)
+            await asyncio.sleep(max(0.0, t0 + k * self.interval_seconds - now))
+
+    def start(self):
+        log = logger.bind(task="pipeline")
+        log.info("starting_pipeline", interval=self.interval_seconds)
+
+        asyncio.run(self._run_forever())
 
 
 if __name__ == "__main__":
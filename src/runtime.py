@@ -0,0 +1,15 @@
+"""
+Thread settings for the model runtimes
+
+Must be imported before torch, OpenMP and MKL read their thread counts once at load
+Format: TORCH_THREADS setting (env var or .env), defaults to every core
+"""
+
+import os
+
+from config import settings
+
+NUM_THREADS = settings.TORCH_THREADS or os.cpu_count() or 1
+
+os.environ.setdefault("OMP_NUM_THREADS", str(NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(NUM_THREADS))
@@ -0,0 +1,141 @@
+"""
+Tests for the dashboard's NumPy aggregations against their pandas reference
+
+- hourly view matches resample("1h").mean() joined on the hour
+- NaN hours and an empty sentiment frame
+- prefix-sum moving average matches rolling(min_periods=1).mean()
+
+`uv run pytest` to run these tests
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Dummy env config for test
+os.environ.setdefault("DB_URL", "sqlite:///:memory:")
+
+from app import process_aggregated_view, rolling_mean
+
+
+def _reference_aggregated_view(df_price: pd.DataFrame, df_sentiment: pd.DataFrame):
+    """The resample based implementation process_aggregated_view replaced"""
+    df_p_agg = df_price.set_index("timestamp").sort_index().resample("1h").mean()
+    if not df_sentiment.empty:
+        df_s = df_sentiment.set_index("published_at").sort_index()
+        df_s_agg = df_s[["sentiment_score"]].resample("1h").mean()
+    else:
+        df_s_agg = pd.DataFrame(index=df_p_agg.index, columns=["sentiment_score"])
+    return df_p_agg.join(df_s_agg, how="outer")
+
+
+def _random_frames(tz, n_price=200, n_sentiment=80, seed=0):
+    """Sparse price and sentiment rows over the same three days, with gaps and NaN scores"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-01-01 00:00", tz=tz)
+    minutes = np.sort(rng.choice(3 * 24 * 60, size=n_price, replace=False))
+    df_price = pd.DataFrame({
+        "timestamp": start + pd.to_timedelta(minutes, unit="min"),
+        "close_price": rng.uniform(1, 10, n_price).astype("float32"),
+        "volume": rng.integers(0, 10_000, n_price).astype("int64"),
+    })
+    # Drop a block of hours so the view has empty (NaN) buckets
+    df_price = df_price[(minutes < 20 * 60) | (minutes > 26 * 60)].reset_index(drop=True)
+
+    minutes = np.sort(rng.choice(3 * 24 * 60, size=n_sentiment, replace=False))
+    scores = rng.uniform(-1, 1, n_sentiment).astype("float32")
+    scores[::10] = np.nan
+    df_sentiment = pd.DataFrame({
+        "published_at": start + pd.to_timedelta(minutes, unit="min"),
+        "sentiment_score": scores,
+    })
+    return df_price, df_sentiment
+
+
+def _assert_same_view(result: pd.DataFrame, expected: pd.DataFrame):
+    """Values, columns and hours must match, dtype width, index resolution and name may differ"""
+    result = result.set_axis(result.index.as_unit("ns"))
+    expected = expected.set_axis(expected.index.as_unit("ns")).astype("float64")
+    pd.testing.assert_frame_equal(
+        result, expected, check_dtype=False, check_freq=False, check_names=False
+    )
+
+
+# -------------------------------------------------------------------------
+# TEST SUITE: process_aggregated_view
+# -------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "Asia/Kuala_Lumpur"])
+def test_aggregated_view_matches_resample(tz):
+    """
+    Test 1: Equivalence
+    - Same hourly index and means as resample("1h").mean() joined on the hour.
+    - Hours without rows stay NaN.
+    """
+    df_price, df_sentiment = _random_frames(tz)
+
+    result = process_aggregated_view(df_price, df_sentiment)
+    expected = _reference_aggregated_view(df_price, df_sentiment)
+
+    assert result["close_price"].isna().any()
+    _assert_same_view(result, expected)
+
+
+def test_aggregated_view_empty_sentiment():
+    """
+    Test 2: Edge case
+    - No sentiment rows gives the price view with an all-NaN sentiment column.
+    """
+    df_price, _ = _random_frames("UTC")
+    df_sentiment = pd.DataFrame({"published_at": [], "sentiment_score": []})
+
+    result = process_aggregated_view(df_price, df_sentiment)
+    expected = _reference_aggregated_view(df_price, df_sentiment)
+
+    assert result["sentiment_score"].isna().all()
+    _assert_same_view(result, expected)
+
+
+def test_aggregated_view_empty_price():
+    """
+    Test 3: Edge case
+    - No price rows gives an empty frame, like the reference.
+    """
+    _, df_sentiment = _random_frames("UTC")
+    empty_price = pd.DataFrame({"timestamp": [], "close_price": [], "volume": []})
+
+    assert process_aggregated_view(empty_price, df_sentiment).empty
+
+
+# -------------------------------------------------------------------------
+# TEST SUITE: rolling_mean
+# -------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("window", [1, 24, 144, 1000])
+def test_rolling_mean_matches_pandas(window):
+    """
+    Test 1: Equivalence
+    - Same as rolling(window, min_periods=1).mean(), NaN points are skipped.
+    - Windows wider than the series and all-NaN windows are covered.
+    """
+    rng = np.random.default_rng(1)
+    values = rng.uniform(-1, 1, 500)
+    values[rng.random(500) < 0.3] = np.nan
+    # A run of NaN longer than the smallest windows
+    values[100:130] = np.nan
+
+    expected = pd.Series(values).rolling(window=window, min_periods=1).mean().to_numpy()
+
+    np.testing.assert_allclose(rolling_mean(values, window), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_rolling_mean_empty():
+    """
+    Test 2: Edge case
+    - An empty series gives an empty result.
+    """
+    assert rolling_mean(np.array([], dtype="float64"), 24).shape == (0,)
@@ -7,10 +7,10 @@ Tests for rss feed and price fetching ingestion
 `uv run pytest` to run these tests
 """
 
-import hashlib
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pandas as pd
+import xxhash
 
 try:
     from ingestion import fetch_price, fetch_rss_feed
@@ -22,9 +22,9 @@ except ImportError:
 # -------------------------------------------------------------------------
 
 
-@patch("ingestion.pd.read_sql")
+@patch("ingestion._fetch_feeds", new_callable=AsyncMock, return_value=[b"<rss/>"])
 @patch("ingestion.feedparser.parse")
-def test_fetch_rss_feed_logic_and_dedup(mock_parse, mock_read_sql):
+def test_fetch_rss_feed_logic_and_dedup(mock_parse, mock_fetch):
     """
     Test 1: Core Logic
     - Parses RSS feed correctly.
@@ -41,13 +41,12 @@ def test_fetch_rss_feed_logic_and_dedup(mock_parse, mock_read_sql):
     )
     mock_parse.return_value = MagicMock(entries=[mock_entry_new, mock_entry_old])
 
-    old_hash = hashlib.md5("http://news.com/old".encode("utf-8")).hexdigest()
-    # 2. Mock Database (Returns 1 existing link)
+    new_hash = xxhash.xxh3_128_hexdigest("http://news.com/new".encode("utf-8"))
+    # 2. Mock Database (Anti-join returns only the link not in the DB)
     # This simulates that "http://news.com/old" is already in the DB
-    mock_read_sql.return_value = pd.DataFrame({"link": [old_hash]})
-
-    # Mock Engine
     mock_engine = MagicMock()
+    mock_cursor = mock_engine.raw_connection.return_value.cursor.return_value
+    mock_cursor.fetchall.return_value = [(new_hash,)]
 
     # Input
     url_map = [{"ticker": "1155.KL", "alias": "Maybank", "feed_url": "http://fake.url"}]
@@ -62,16 +61,20 @@ def test_fetch_rss_feed_logic_and_dedup(mock_parse, mock_read_sql):
 
     # Deduplication check: Should only have 1 row (The "New News")
     assert len(result_df) == 1
-    new_hash = hashlib.md5("http://news.com/new".encode("utf-8")).hexdigest()
     assert result_df.iloc[0]["link"] == new_hash
 
+    # Both candidate links are uploaded for the server-side check
+    copied_links = mock_cursor.copy_expert.call_args[0][1].getvalue().split("\n")
+    assert len(copied_links) == 2
+
     # Schema check
     expected_cols = ["headline", "ticker", "alias", "link", "published_at"]
     assert all(col in result_df.columns for col in expected_cols)
 
 
+@patch("ingestion._fetch_feeds", new_callable=AsyncMock, return_value=[b"<rss/>"])
 @patch("ingestion.feedparser.parse")
-def test_fetch_rss_feed_db_failure(mock_parse):
+def test_fetch_rss_feed_db_failure(mock_parse, mock_fetch):
     """
     Test 2: DB Connection Failure (Fail-Open)
     - If DB connection fails, return ALL fetched items instead of crashing.
@@ -84,9 +87,9 @@ def test_fetch_rss_feed_db_failure(mock_parse):
         ]
     )
 
-    # Mock Engine to raise error on connect()
+    # Mock Engine to raise error on raw_connection()
     mock_engine = MagicMock()
-    mock_engine.connect.side_effect = Exception("DB Down")
+    mock_engine.raw_connection.side_effect = Exception("DB Down")
 
     url_map = [{"ticker": "T", "alias": "A", "feed_url": "u"}]
 
@@ -100,8 +103,9 @@ def test_fetch_rss_feed_db_failure(mock_parse):
     assert not result_df.empty
 
 
+@patch("ingestion._fetch_feeds", new_callable=AsyncMock, return_value=[b"<rss/>"])
 @patch("ingestion.feedparser.parse")
-def test_fetch_rss_feed_empty_or_error(mock_parse):
+def test_fetch_rss_feed_empty_or_error(mock_parse, mock_fetch):
     """
     Test 3: Resilience
     - Returns empty DataFrame on network error or empty feed.
@@ -119,6 +123,35 @@ def test_fetch_rss_feed_empty_or_error(mock_parse):
     assert result_df.empty
 
 
+@patch("ingestion._fetch_feeds", new_callable=AsyncMock)
+@patch("ingestion.feedparser.parse")
+def test_fetch_rss_feed_partial_download_failure(mock_parse, mock_fetch):
+    """
+    Test 4: Partial Failure
+    - A feed that fails to download is skipped, the others are still parsed.
+    """
+    # --- ARRANGE ---
+    mock_fetch.return_value = [Exception("Timeout"), b"<rss/>"]
+    mock_parse.return_value = MagicMock(
+        entries=[MagicMock(title="B", link="link_b", published="2024-01-01")]
+    )
+    mock_engine = MagicMock()
+    mock_engine.raw_connection.side_effect = Exception("DB Down")
+
+    url_map = [
+        {"ticker": "T1", "alias": "A1", "feed_url": "u1"},
+        {"ticker": "T2", "alias": "A2", "feed_url": "u2"},
+    ]
+
+    # --- ACT ---
+    result_df = fetch_rss_feed(url_map, mock_engine)
+
+    # --- ASSERT ---
+    mock_parse.assert_called_once_with(b"<rss/>")
+    assert len(result_df) == 1
+    assert result_df.iloc[0]["ticker"] == "T2"
+
+
 # -------------------------------------------------------------------------
 # TEST SUITE 2: fetch_price
 # -------------------------------------------------------------------------
@@ -127,7 +160,7 @@ def test_fetch_rss_feed_empty_or_error(mock_parse):
 @patch("ingestion.yf.download")
 def test_fetch_price_logic_cleaning(mock_download):
     """
-    Test 4: Core Logic
+    Test 5: Core Logic
     - Handles multiple tickers.
     - Cleans NaN values.
     - Renames columns correctly.
@@ -176,7 +209,7 @@ def test_fetch_price_logic_cleaning(mock_download):
 @patch("ingestion.yf.download")
 def test_fetch_price_failure(mock_download):
     """
-    Test 5: Resilience
+    Test 6: Resilience
     - Returns empty DataFrame with correct columns if no data found.
     """
     # --- ARRANGE ---
@@ -1,6 +1,7 @@
+import asyncio
 import os
 from datetime import datetime, timedelta, timezone
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pandas as pd
 import pytest
@@ -170,3 +171,78 @@ def test_inference_failure_isolation(mock_pipeline):
         assert len(saved_sentiments) == 0
     except Exception:
         pass  # Table might not exist, which is also correct
+
+
+def test_async_run_classifies_previous_headlines(mock_pipeline):
+    """
+    Scenario: Two overlapped runs.
+    Expectation: Run N's headlines are classified and written during run N+1.
+    """
+    now = datetime.now(timezone.utc)
+    first_rss = pd.DataFrame({"headline": ["First"], "link": ["http://a"], "published_at": [now]})
+    second_rss = pd.DataFrame({"headline": ["Second"], "link": ["http://b"], "published_at": [now]})
+
+    with (
+        patch("pipeline.fetch_rss_feed", side_effect=[first_rss, second_rss]),
+        patch("pipeline.fetch_price", return_value=pd.DataFrame()),
+        patch.object(mock_pipeline.classifier, "classify", return_value=first_rss) as mock_classify,
+        patch.object(mock_pipeline, "sentiment_writer") as mock_writer,
+    ):
+        # Run N: nothing pending, headlines are only handed back
+        pending_rss = asyncio.run(mock_pipeline.run_pipeline_async(pd.DataFrame()))
+        mock_classify.assert_not_called()
+        mock_writer.assert_not_called()
+
+        # Run N+1: run N's headlines are classified and written
+        pending_rss = asyncio.run(mock_pipeline.run_pipeline_async(pending_rss))
+
+    assert mock_classify.call_count == 1
+    assert mock_classify.call_args[0][0]["link"].tolist() == ["http://a"]
+    mock_writer.assert_called_once()
+    assert pending_rss["link"].tolist() == ["http://b"]
+
+
+def test_async_run_drops_links_still_pending(mock_pipeline):
+    """
+    Scenario: This run's fetch returns a link that is still being written.
+    Expectation: The link is not handed to the next run a second time.
+    """
+    now = datetime.now(timezone.utc)
+    pending_rss = pd.DataFrame({"headline": ["Old"], "link": ["http://a"], "published_at": [now]})
+    fetched_rss = pd.DataFrame({
+        "headline": ["Old", "New"],
+        "link": ["http://a", "http://b"],
+        "published_at": [now, now],
+    })
+
+    with (
+        patch("pipeline.fetch_rss_feed", return_value=fetched_rss),
+        patch("pipeline.fetch_price", return_value=pd.DataFrame()),
+        patch.object(mock_pipeline.classifier, "classify", return_value=pending_rss),
+        patch.object(mock_pipeline, "sentiment_writer"),
+    ):
+        next_rss = asyncio.run(mock_pipeline.run_pipeline_async(pending_rss))
+
+    assert next_rss["link"].tolist() == ["http://b"]
+
+
+def test_run_forever_resets_pending_after_failure(mock_pipeline):
+    """
+    Scenario: A run raises.
+    Expectation: The loop survives and the next run starts with nothing pending.
+    """
+    first_rss = pd.DataFrame({"headline": ["First"], "link": ["http://a"]})
+    mock_run = AsyncMock(side_effect=[first_rss, Exception("Run Exploded"), asyncio.CancelledError])
+
+    # The third run cancels the loop, it is the only way out of _run_forever
+    with (
+        patch.object(mock_pipeline, "run_pipeline_async", mock_run),
+        patch("pipeline.asyncio.sleep", new_callable=AsyncMock),
+        pytest.raises(asyncio.CancelledError),
+    ):
+        asyncio.run(mock_pipeline._run_forever())
+
+    pending_per_run = [call.args[0] for call in mock_run.call_args_list]
+    assert pending_per_run[0].empty
+    assert pending_per_run[1]["link"].tolist() == ["http://a"]
+    assert pending_per_run[2].empty
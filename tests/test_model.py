@@ -0,0 +1,124 @@
+"""
+Tests for the classifier's prediction cache and pre-filter
+
+- duplicate and repeated headlines reach the model once
+- least recently used eviction
+- trivial headlines scored neutral without the model
+
+`uv run pytest` to run these tests
+"""
+
+import os
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+# Dummy env config for test
+os.environ.setdefault("DB_URL", "sqlite:///:memory:")
+
+from model import SentimenClassifier
+
+
+def _fake_predict(headlines):
+    """Positive for every headline, score encodes the headline length so results are traceable"""
+    labels = np.array(["positive"] * len(headlines))
+    scores = np.array([len(h) / 100 for h in headlines], dtype=np.float64)
+    return labels, scores
+
+
+@pytest.fixture
+def classifier():
+    """Classifier without a model, _predict is stubbed"""
+    clf = object.__new__(SentimenClassifier)
+    clf._cache = OrderedDict()
+    clf.neutral_label = "neutral"
+    clf._predict = MagicMock(side_effect=_fake_predict)
+    return clf
+
+
+# -------------------------------------------------------------------------
+# TEST SUITE: _predict_cached
+# -------------------------------------------------------------------------
+
+
+def test_duplicates_hit_model_once(classifier):
+    """
+    Test 1: Deduplication
+    - Each unique headline is predicted once, results expand back to input order.
+    - A second call with the same headlines is served from the cache.
+    """
+    headlines = ["Bank profit rises", "Shares fall sharply", "Bank profit rises"]
+
+    labels, scores = classifier._predict_cached(headlines)
+
+    classifier._predict.assert_called_once()
+    assert sorted(classifier._predict.call_args[0][0]) == [
+        "Bank profit rises",
+        "Shares fall sharply",
+    ]
+    assert labels.tolist() == ["positive"] * 3
+    assert scores.tolist() == [0.17, 0.19, 0.17]
+
+    classifier._predict_cached(headlines)
+    classifier._predict.assert_called_once()
+
+
+def test_hits_move_to_end(classifier):
+    """
+    Test 2: Recency
+    - A cache hit becomes the most recently used entry.
+    """
+    classifier._predict_cached(["Alpha shares rise", "Beta shares rise"])
+    assert list(classifier._cache) == ["Alpha shares rise", "Beta shares rise"]
+
+    classifier._predict_cached(["Alpha shares rise"])
+    assert list(classifier._cache) == ["Beta shares rise", "Alpha shares rise"]
+
+
+def test_evicts_least_recently_used(classifier):
+    """
+    Test 3: Eviction
+    - Beyond CACHE_SIZE the least recently used entry is dropped, not the oldest inserted.
+    """
+    with patch("model.CACHE_SIZE", 2):
+        classifier._predict_cached(["Alpha shares rise", "Beta shares rise"])
+        # Refresh Alpha, so Beta is now the least recently used
+        classifier._predict_cached(["Alpha shares rise"])
+        classifier._predict_cached(["Gamma shares rise"])
+
+    assert list(classifier._cache) == ["Alpha shares rise", "Gamma shares rise"]
+
+    # Beta was evicted and goes back to the model
+    classifier._predict.reset_mock()
+    classifier._predict_cached(["Beta shares rise"])
+    classifier._predict.assert_called_once_with(["Beta shares rise"])
+
+
+def test_trivial_headlines_skip_model(classifier):
+    """
+    Test 4: Pre-filter
+    - Empty, numeric-only and single-word headlines come back neutral with score 0.
+    - They never reach the model and are not cached.
+    """
+    headlines = ["", "12345 678", "Maybank", "Maybank shares rise"]
+
+    labels, scores = classifier._predict_cached(headlines)
+
+    classifier._predict.assert_called_once_with(["Maybank shares rise"])
+    assert labels.tolist() == ["neutral", "neutral", "neutral", "positive"]
+    assert scores.tolist() == [0.0, 0.0, 0.0, 0.19]
+    assert list(classifier._cache) == ["Maybank shares rise"]
+
+
+def test_all_trivial_headlines_skip_model(classifier):
+    """
+    Test 5: Edge case
+    - A batch with nothing classifiable never calls the model.
+    """
+    labels, scores = classifier._predict_cached(["", "   ", "42"])
+
+    classifier._predict.assert_not_called()
+    assert labels.tolist() == ["neutral"] * 3
+    assert scores.tolist() == [0.0] * 3
@@ -0,0 +1,150 @@
+"""
+Tests for the pipeline's sentiment bulk writer
+
+- COPY payload and statement order
+- commit and rollback handling
+
+`uv run pytest` to run these tests
+"""
+
+import os
+import re
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, call, patch
+
+import pandas as pd
+import psycopg2
+import pytest
+
+# Dummy env config for test
+os.environ.setdefault("DB_URL", "sqlite:///:memory:")
+
+from pipeline import SENTIMENT_COLUMNS, SENTIMENT_TEXT_COLUMNS, Pipeline
+
+
+@pytest.fixture
+def writer_pipeline():
+    """Pipeline with a mocked engine, no model or database needed"""
+    mock_engine = MagicMock()
+    with (
+        patch("pipeline.engine", mock_engine),
+        patch("pipeline.init_db"),
+        patch("pipeline.SentimenClassifier"),
+        patch.object(Pipeline, "_get_time_mark", return_value=None),
+    ):
+        yield Pipeline()
+
+
+@pytest.fixture
+def classified_df():
+    # Extra columns and a shuffled order, the writer must select SENTIMENT_COLUMNS itself
+    return pd.DataFrame({
+        "link": ["http://news.com/a"],
+        "sentiment_label": ["positive"],
+        "headline": ["Maybank, profit up"],
+        "extra": ["dropped"],
+        "sentiment_score": [0.9],
+        "ticker": ["1155.KL"],
+        "alias": ["Maybank"],
+        "published_at": [datetime(2024, 1, 2, 10, 0, tzinfo=timezone.utc)],
+    })
+
+
+# -------------------------------------------------------------------------
+# TEST SUITE: sentiment_writer
+# -------------------------------------------------------------------------
+
+
+def test_sentiment_writer_copies_then_moves_rows(writer_pipeline, classified_df):
+    """
+    Test 1: Happy path
+    - COPY names the columns in SENTIMENT_COLUMNS order and streams matching CSV.
+    - INSERT from the stage runs before TRUNCATE.
+    - Commits and closes the connection.
+    """
+    mock_conn = writer_pipeline.db_engine.raw_connection.return_value
+    mock_cursor = mock_conn.cursor.return_value
+
+    # copy_expert reads the buffer, capture it while it is still open
+    copied = {}
+
+    def capture_copy(sql, buffer):
+        copied["sql"] = sql
+        copied["payload"] = buffer.read()
+
+    mock_cursor.copy_expert.side_effect = capture_copy
+
+    writer_pipeline.sentiment_writer(classified_df)
+
+    columns = ", ".join(SENTIMENT_COLUMNS)
+    not_null = ", ".join(SENTIMENT_TEXT_COLUMNS)
+    assert copied["sql"] == (
+        f"COPY sentiment_stage ({columns}) FROM STDIN "
+        f"WITH (FORMAT csv, FORCE_NOT_NULL ({not_null}))"
+    )
+    assert copied["payload"] == (
+        '1155.KL,Maybank,"Maybank, profit up",0.9,positive,http://news.com/a,'
+        "2024-01-02 10:00:00+00:00\n"
+    )
+
+    executed = [c.args[0] for c in mock_cursor.execute.call_args_list]
+    assert len(executed) == 2
+    assert executed[0].startswith(f"INSERT INTO sentiment ({columns}) SELECT {columns}")
+    assert "ON CONFLICT (link) DO NOTHING" in executed[0]
+    assert executed[1] == "TRUNCATE sentiment_stage"
+
+    assert mock_conn.method_calls[-2:] == [call.commit(), call.close()]
+    mock_conn.rollback.assert_not_called()
+
+
+def test_sentiment_writer_keeps_empty_headlines(writer_pipeline, classified_df):
+    """
+    Test 2: Empty headline
+    - Serializes as a bare empty field, which COPY csv would read as NULL.
+    - FORCE_NOT_NULL covers headline so it is stored as '' instead of failing the batch.
+    """
+    mock_cursor = writer_pipeline.db_engine.raw_connection.return_value.cursor.return_value
+    copied = {}
+
+    def capture_copy(sql, buffer):
+        copied["sql"] = sql
+        copied["payload"] = buffer.read()
+
+    mock_cursor.copy_expert.side_effect = capture_copy
+
+    writer_pipeline.sentiment_writer(classified_df.assign(headline="", sentiment_label="neutral"))
+
+    assert copied["payload"] == (
+        "1155.KL,Maybank,,0.9,neutral,http://news.com/a,2024-01-02 10:00:00+00:00\n"
+    )
+    force_not_null = re.search(r"FORCE_NOT_NULL \((.*?)\)", copied["sql"]).group(1)
+    assert {"ticker", "alias", "headline", "sentiment_label", "link"} <= set(
+        force_not_null.split(", ")
+    )
+
+
+def test_sentiment_writer_rolls_back_on_db_error(writer_pipeline, classified_df):
+    """
+    Test 3: Error handling
+    - A psycopg2 error rolls back instead of committing.
+    - The error is logged, not raised, and the connection is still closed.
+    """
+    mock_conn = writer_pipeline.db_engine.raw_connection.return_value
+    mock_cursor = mock_conn.cursor.return_value
+    mock_cursor.execute.side_effect = psycopg2.Error("Unique violation")
+
+    writer_pipeline.sentiment_writer(classified_df)
+
+    mock_conn.rollback.assert_called_once()
+    mock_conn.commit.assert_not_called()
+    mock_conn.close.assert_called_once()
+
+
+def test_sentiment_writer_skips_empty(writer_pipeline):
+    """
+    Test 4: Edge case
+    - An empty frame never opens a connection.
+    """
+    writer_pipeline.sentiment_writer(pd.DataFrame())
+
+    writer_pipeline.db_engine.raw_connection.assert_not_called()